@@ -1,10 +1,25 @@
 import argparse
-import csv
+import asyncio
+import dataclasses
+import gzip
+import hashlib
+import math
+import queue
 import random
+import sqlite3
+import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
+import httpx
+import numpy as np
+import orjson
+import pyarrow as pa
+import pyarrow.csv as pacsv
 import requests
-from sklearn.metrics import classification_report, confusion_matrix, f1_score
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Webhook URLs for different providers
 WEBHOOK_URLS = {
@@ -12,6 +27,74 @@ WEBHOOK_URLS = {
     "chatgpt": "http://localhost:5678/webhook/d15a6547-dd1d-4031-b6fa-fe92165249eb",
 }
 
+# Number of buffered progress lines written to stdout at once
+LOG_FLUSH_LINES = 32
+
+# HTTP status codes that make the adaptive controller back off
+OVERLOAD_STATUS_CODES = (429, 503)
+
+# How often the adaptive controller resends a batch rejected as overloaded
+OVERLOAD_RETRIES = 3
+
+# Class labels in confusion matrix order
+LABELS = ["fake", "true"]
+
+# Response fields checked for a prediction, in priority order
+PREDICTION_FIELDS = (
+    "prediction",
+    "label",
+    "result",
+    "classification",
+    "output",
+    "content",
+)
+
+# Raw response values (lowercased) mapped to their class label
+LABEL_MAP = {
+    "fake": "fake",
+    "false": "fake",
+    "0": "fake",
+    "true": "true",
+    "real": "true",
+    "1": "true",
+}
+
+# (connect, read) timeout in seconds
+REQUEST_TIMEOUT = (3.05, 60)
+
+# Shared session so TCP connections are reused across requests
+SESSION = requests.Session()
+SESSION.headers.update({"Connection": "keep-alive", "Content-Type": "application/json"})
+
+
+def configure_session(pool_size):
+    """Mount connection-pooling adapters sized for the number of parallel requests."""
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        # POST is not idempotent: only retry when the request never reached n8n
+        # (connection errors) or a proxy rejected it, never after a read timeout
+        max_retries=Retry(
+            total=2,
+            connect=2,
+            read=False,
+            status=2,
+            backoff_factor=0.1,
+            status_forcelist=[502, 503],
+            allowed_methods=frozenset(["POST"]),
+        ),
+    )
+    SESSION.mount("http://", adapter)
+    SESSION.mount("https://", adapter)
+
+
+def positive_int(value):
+    """argparse type for integer options that must be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value}")
+    return number
+
 
 def parse_arguments():
     """Parse command-line arguments."""
@@ -24,6 +107,12 @@ Examples:
   python webhook_trigger.py --provider chatgpt --samples 50
   python webhook_trigger.py -p ollama -s 200 --fake-csv data/fake.csv --true-csv data/true.csv
   python webhook_trigger.py --provider ollama --url http://custom-url.com/webhook
+  python webhook_trigger.py --provider chatgpt --concurrency 4
+  python webhook_trigger.py --provider ollama --batch-size 10
+  python webhook_trigger.py --provider chatgpt --url https://n8n.example.com/webhook --http2
+  python webhook_trigger.py --provider ollama --adaptive --concurrency 64
+  python webhook_trigger.py --provider chatgpt --max-chars 4096 --gzip
+  python webhook_trigger.py --provider ollama --seed 42 --cache cache.db
         """,
     )
 
@@ -69,45 +158,413 @@ Examples:
         "--seed", type=int, default=None, help="Random seed for reproducible sampling"
     )
 
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=positive_int,
+        default=1,
+        help="Number of webhook requests sent in parallel (default: 1, sequential "
+        "like earlier runs; with more, latency includes queueing at the server)",
+    )
+
+    parser.add_argument(
+        "-b",
+        "--batch-size",
+        type=positive_int,
+        default=1,
+        help="Number of samples sent per webhook request as {'items': [...]} "
+        "(default: 1, sends a single {'title', 'text'} object)",
+    )
+
+    parser.add_argument(
+        "--http2",
+        action="store_true",
+        help="Send requests from an asyncio httpx client that multiplexes them "
+        "over one HTTP/2 connection (https:// endpoints only, otherwise HTTP/1.1)",
+    )
+
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="Adapt the number of parallel requests between 1 and --concurrency "
+        "to latency and 429/503 responses (uses the asyncio httpx client)",
+    )
+
+    parser.add_argument(
+        "--max-chars",
+        type=positive_int,
+        default=None,
+        help="Truncate article text to this many characters before sending "
+        "(default: send the full text)",
+    )
+
+    parser.add_argument(
+        "--gzip",
+        action="store_true",
+        help="Compress request bodies with gzip (Content-Encoding: gzip)",
+    )
+
+    parser.add_argument(
+        "--cache",
+        type=str,
+        default=None,
+        help="SQLite file caching predictions across runs; cached samples are "
+        "not sent again and do not count towards latency (default: disabled)",
+    )
+
     return parser.parse_args()
 
 
-def load_csv(filepath, label):
-    """Load CSV file and return list of dictionaries with source label."""
-    data = []
-    with open(filepath, "r", encoding="utf-8") as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            row["_source"] = label  # 'fake' or 'true'
-            data.append(row)
-    return data
+def iter_csv_batches(filepath):
+    """Stream the title and text columns of a CSV file as Arrow record batches."""
+    return pacsv.open_csv(
+        filepath,
+        # Quoted article text may contain newlines
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=["title", "text"],
+            column_types={"title": pa.string(), "text": pa.string()},
+        ),
+    )
 
 
-def send_to_webhook(webhook_url, title, text):
-    """Send title and text to the webhook and measure latency."""
-    payload = {"title": title, "text": text}
+def sample_csvs(fake_path, true_path, sample_size):
+    """
+    Draw sample_size random rows from both CSV files combined in one streaming
+    pass (reservoir sampling over record batches, so only the sampled rows are
+    kept in memory) and return them as a list of (title, text, source label) tuples.
+    """
+    reservoir = []
+    seen = 0
+    for filepath, label in ((fake_path, "fake"), (true_path, "true")):
+        for batch in iter_csv_batches(filepath):
+            # Pick reservoir slots for the whole batch first so that only the
+            # rows that end up in the reservoir are converted to Python strings
+            picks = {}
+            for row in range(batch.num_rows):
+                if seen < sample_size:
+                    picks[seen] = row
+                else:
+                    # Keep the new row with probability sample_size / (seen + 1)
+                    slot = random.randrange(seen + 1)
+                    if slot < sample_size:
+                        picks[slot] = row
+                seen += 1
+
+            titles, texts = batch.column("title"), batch.column("text")
+            for slot, row in picks.items():
+                item = (titles[row].as_py(), texts[row].as_py(), label)
+                if slot == len(reservoir):
+                    reservoir.append(item)
+                else:
+                    reservoir[slot] = item
+
+    # The reservoir keeps file order for rows that were never replaced
+    random.shuffle(reservoir)
+    return reservoir
+
+
+def open_cache(filepath):
+    """Open (and create if needed) the SQLite prediction cache."""
+    connection = sqlite3.connect(filepath)
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS kv (hash BLOB PRIMARY KEY, pred TEXT NOT NULL)"
+    )
+    return connection
+
+
+def cache_key(provider, webhook_url, title, text):
+    """Hash everything that determines a prediction into a 16-byte cache key."""
+    content = "\0".join((provider, webhook_url, title, text))
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=16).digest()
+
+
+def chunked(iterable, size):
+    """Yield successive lists of at most size items from iterable."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
 
-    start_time = time.time()
-    try:
-        response = requests.post(webhook_url, json=payload)
-        end_time = time.time()
-        latency = (end_time - start_time) * 1000  # Convert to milliseconds
 
+def encode_payload(items, compress=False):
+    """
+    Encode a list of {"title", "text"} items as a JSON request body.
+    A single item is sent as-is, multiple items are wrapped as {"items": [...]}.
+    Returns the body and any extra request headers.
+    """
+    payload = items[0] if len(items) == 1 else {"items": items}
+    body = orjson.dumps(payload)
+    if compress:
+        # Level 6 compresses article text nearly as well as 9 at a fraction of the cost
+        return gzip.compress(body, compresslevel=6), {"Content-Encoding": "gzip"}
+    return body, {}
+
+
+def send_to_webhook(webhook_url, items, compress=False):
+    """Send a list of {"title", "text"} items to the webhook and measure latency."""
+    body, headers = encode_payload(items, compress)
+
+    start_time = time.perf_counter_ns()
+    response = None
+    try:
+        response = SESSION.post(
+            webhook_url, data=body, headers=headers, timeout=REQUEST_TIMEOUT
+        )
         response.raise_for_status()
-        return {"success": True, "response": response.json(), "latency_ms": latency}
-    except requests.exceptions.JSONDecodeError:
-        end_time = time.time()
-        latency = (end_time - start_time) * 1000
-        return {
+        result = {"success": True, "response": orjson.loads(response.content)}
+    except orjson.JSONDecodeError:
+        result = {
             "success": False,
             "error": "Invalid JSON response",
-            "latency_ms": latency,
-            "raw_response": response.text if "response" in dir() else None,
+            "raw_response": response.text if response is not None else None,
         }
     except requests.exceptions.RequestException as e:
-        end_time = time.time()
-        latency = (end_time - start_time) * 1000
-        return {"success": False, "error": str(e), "latency_ms": latency}
+        result = {"success": False, "error": str(e)}
+
+    result["latency_ms"] = (time.perf_counter_ns() - start_time) / 1e6
+    return result
+
+
+async def send_to_webhook_async(client, webhook_url, items, compress=False):
+    """Async counterpart of send_to_webhook using a shared httpx client."""
+    body, headers = encode_payload(items, compress)
+
+    start_time = time.perf_counter_ns()
+    response = None
+    try:
+        response = await client.post(webhook_url, content=body, headers=headers)
+        response.raise_for_status()
+        result = {"success": True, "response": orjson.loads(response.content)}
+    except orjson.JSONDecodeError:
+        result = {
+            "success": False,
+            "error": "Invalid JSON response",
+            "raw_response": response.text if response is not None else None,
+        }
+    except httpx.HTTPStatusError as e:
+        result = {
+            "success": False,
+            "error": str(e),
+            "status_code": e.response.status_code,
+        }
+    except httpx.HTTPError as e:
+        result = {"success": False, "error": str(e)}
+
+    result["latency_ms"] = (time.perf_counter_ns() - start_time) / 1e6
+    return result
+
+
+def batch_items(batch, max_chars=None):
+    """
+    Build the list of {"title", "text"} items for a batch of (index, sample),
+    truncating each text to max_chars characters if given.
+    """
+    return [{"title": title, "text": text[:max_chars]} for _, (title, text, _) in batch]
+
+
+def send_batches(webhook_url, batches, concurrency, max_chars=None, compress=False):
+    """Send batches from a thread pool and yield (batch, result) as each completes."""
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            executor.submit(
+                send_to_webhook, webhook_url, batch_items(batch, max_chars), compress
+            ): batch
+            for batch in batches
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+class AdaptiveLimiter:
+    """
+    Limits requests in flight like a semaphore, but adapts the limit to the
+    server: after every window of completed requests the limit doubles (up to
+    maximum) while the error rate stays below 1% and p95 latency grew by less
+    than 10%. A 429/503 response halves the limit once per congestion event,
+    i.e. only for requests started since the last decrease, and blocks new
+    requests for the backoff period. Limit changes are collected in messages
+    instead of printed, since the limiter runs on the event-loop thread.
+    """
+
+    def __init__(self, maximum, initial=4, window=32, backoff=1.0):
+        self.maximum = maximum
+        self.limit = min(initial, maximum)
+        self.window = window
+        self.backoff = backoff
+        self.inflight = 0
+        self.generation = 0
+        self.latencies = []
+        self.errors = 0
+        self.last_p95 = None
+        self.messages = []
+        self.condition = asyncio.Condition()
+        self.resume = asyncio.Event()
+        self.resume.set()
+
+    async def acquire(self):
+        """Wait for a free slot outside any backoff pause and return its generation."""
+        while True:
+            await self.resume.wait()
+            async with self.condition:
+                await self.condition.wait_for(lambda: self.inflight < self.limit)
+                if self.resume.is_set():
+                    self.inflight += 1
+                    return self.generation
+
+    async def release(self):
+        async with self.condition:
+            self.inflight -= 1
+            self.condition.notify(1)
+
+    def take_messages(self):
+        """Return and clear the limit changes logged so far."""
+        messages, self.messages = self.messages, []
+        return messages
+
+    def set_limit(self, limit):
+        if limit != self.limit:
+            self.messages.append(f"Adaptive concurrency: {self.limit} -> {limit}")
+            self.limit = limit
+
+    async def record(self, result, generation):
+        """
+        Update the limit with the result of a request started in generation.
+        Returns True if the server rejected it as overloaded.
+        """
+        if result.get("status_code") in OVERLOAD_STATUS_CODES:
+            # Requests already in flight at the last decrease belong to the same event
+            if generation == self.generation:
+                self.generation += 1
+                self.set_limit(max(self.limit // 2, 1))
+                self.latencies.clear()
+                self.errors = 0
+                self.resume.clear()
+                asyncio.get_running_loop().call_later(self.backoff, self.resume.set)
+            return True
+
+        self.latencies.append(result["latency_ms"])
+        self.errors += not result["success"]
+        if len(self.latencies) < self.window:
+            return False
+
+        p95 = np.percentile(self.latencies, 95)
+        error_rate = self.errors / len(self.latencies)
+        stable = self.last_p95 is None or p95 < self.last_p95 * 1.1
+        if error_rate < 0.01 and stable:
+            async with self.condition:
+                old_limit = self.limit
+                self.set_limit(min(self.limit * 2, self.maximum))
+                self.condition.notify(self.limit - old_limit)
+        self.last_p95 = p95
+        self.latencies.clear()
+        self.errors = 0
+        return False
+
+
+async def send_batches_http2(
+    webhook_url, batches, concurrency, adaptive=False, max_chars=None, compress=False
+):
+    """
+    Send all batches concurrently from one httpx client and yield
+    (batch, result) as each completes. Against an HTTP/2 server all requests
+    share a single connection as separate streams. With adaptive, the number
+    of requests in flight is steered by an AdaptiveLimiter instead of being
+    fixed at concurrency.
+    """
+    limiter = (
+        AdaptiveLimiter(concurrency) if adaptive else asyncio.Semaphore(concurrency)
+    )
+
+    async def send(client, batch):
+        items = batch_items(batch, max_chars)
+        if not adaptive:
+            async with limiter:
+                result = await send_to_webhook_async(
+                    client, webhook_url, items, compress
+                )
+            return batch, result
+
+        # Resend batches rejected as overloaded once the backoff has passed
+        for _ in range(OVERLOAD_RETRIES + 1):
+            generation = await limiter.acquire()
+            try:
+                result = await send_to_webhook_async(
+                    client, webhook_url, items, compress
+                )
+            finally:
+                await limiter.release()
+            if not await limiter.record(result, generation):
+                break
+        # Hand limit changes to the consumer so they are logged in order
+        result["messages"] = limiter.take_messages()
+        return batch, result
+
+    transport = httpx.AsyncHTTPTransport(
+        http2=True,
+        retries=2,
+        limits=httpx.Limits(
+            max_connections=concurrency, max_keepalive_connections=concurrency
+        ),
+    )
+    async with httpx.AsyncClient(
+        transport=transport,
+        headers={"Content-Type": "application/json"},
+        timeout=httpx.Timeout(REQUEST_TIMEOUT[1], connect=REQUEST_TIMEOUT[0]),
+    ) as client:
+        for completed in asyncio.as_completed(
+            [send(client, batch) for batch in batches]
+        ):
+            yield await completed
+
+
+def stream_batches_http2(webhook_url, batches, concurrency, **options):
+    """
+    Run send_batches_http2 on an event loop in a background thread and yield
+    (batch, result) from a queue as each completes, like send_batches.
+    """
+    completed = queue.Queue()
+    done = object()
+    errors = []
+
+    async def drain():
+        async for item in send_batches_http2(
+            webhook_url, batches, concurrency, **options
+        ):
+            completed.put(item)
+
+    def run():
+        try:
+            asyncio.run(drain())
+        except Exception as e:
+            errors.append(e)
+        finally:
+            completed.put(done)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    while (item := completed.get()) is not done:
+        yield item
+    thread.join()
+    if errors:
+        raise errors[0]
+
+
+def flush_lines(lines):
+    """Write buffered output lines to stdout in a single call and clear them."""
+    if lines:
+        sys.stdout.write("\n".join(lines) + "\n")
+        sys.stdout.flush()
+        lines.clear()
+
+
+def normalize_label(value):
+    """Map a raw label value to 'fake' or 'true', or None if unknown."""
+    return LABEL_MAP.get(str(value).lower().strip())
 
 
 def parse_prediction(response_data):
@@ -119,24 +576,129 @@ def parse_prediction(response_data):
         return None
 
     # Try common response field names
-    for field in [
-        "prediction",
-        "label",
-        "result",
-        "classification",
-        "output",
-        "content",
-    ]:
-        if field in response_data:
-            value = str(response_data[field]).lower().strip()
-            if value in ["fake", "false", "0"]:
-                return "fake"
-            elif value in ["true", "real", "1"]:
-                return "true"
+    for field in PREDICTION_FIELDS:
+        value = response_data.get(field)
+        if value is not None:
+            prediction = normalize_label(value)
+            if prediction is not None:
+                return prediction
 
     return None
 
 
+def parse_predictions(response_data, count):
+    """
+    Parse a (possibly batched) webhook response into a list of count predictions.
+    Batched responses are either a list or {"predictions": [...]}, whose entries
+    are plain labels or objects understood by parse_prediction.
+    """
+    if isinstance(response_data, dict) and "predictions" in response_data:
+        response_data = response_data["predictions"]
+
+    if not isinstance(response_data, list):
+        return [parse_prediction(response_data)] if count == 1 else [None] * count
+
+    if len(response_data) != count:
+        return [None] * count
+
+    return [
+        parse_prediction(entry) if isinstance(entry, dict) else normalize_label(entry)
+        for entry in response_data
+    ]
+
+
+@dataclasses.dataclass
+class LatencyStats:
+    """
+    Running latency statistics updated one sample at a time.
+    Values are also kept in a preallocated float32 array for percentiles.
+    """
+
+    capacity: int
+    count: int = 0
+    total: float = 0.0
+    min: float = math.inf
+    max: float = -math.inf
+    values: np.ndarray = dataclasses.field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.values = np.empty(self.capacity, dtype=np.float32)
+
+    def add(self, latency):
+        """Record one latency in milliseconds."""
+        self.values[self.count] = latency
+        self.count += 1
+        self.total += latency
+        self.min = min(self.min, latency)
+        self.max = max(self.max, latency)
+
+    @property
+    def mean(self):
+        return self.total / self.count
+
+    def percentiles(self, q):
+        """Return the given percentiles of all recorded latencies."""
+        return np.percentile(self.values[: self.count], q)
+
+
+def confusion_counts(y_true, y_pred):
+    """
+    Count the 2x2 confusion matrix with a single vectorized pass.
+    Rows are actual labels, columns are predicted labels, both in LABELS order.
+    """
+    actual = np.fromiter(
+        (label == "true" for label in y_true), dtype=np.uint8, count=len(y_true)
+    )
+    predicted = np.fromiter(
+        (label == "true" for label in y_pred), dtype=np.uint8, count=len(y_pred)
+    )
+    return np.bincount(actual * 2 + predicted, minlength=4).reshape(2, 2)
+
+
+def class_scores(cm):
+    """Derive (precision, recall, f1, support) per class from a confusion matrix."""
+    tp = np.diag(cm)
+    predicted = cm.sum(axis=0)
+    support = cm.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(predicted, tp / predicted, 0.0)
+        recall = np.where(support, tp / support, 0.0)
+        f1 = np.where(predicted + support, 2 * tp / (predicted + support), 0.0)
+    return list(zip(precision.tolist(), recall.tolist(), f1.tolist(), support.tolist()))
+
+
+def format_classification_report(scores, accuracy, digits=2):
+    """Format per-class scores like sklearn's classification_report."""
+    total = sum(support for *_, support in scores)
+    averages = {
+        "macro avg": [
+            sum(score[j] for score in scores) / len(scores) for j in range(3)
+        ],
+        "weighted avg": [
+            sum(score[j] * score[3] for score in scores) / total for j in range(3)
+        ],
+    }
+
+    width = max(len(name) for name in LABELS + list(averages))
+    row_fmt = "{:>{width}s} " + " {:>9.{digits}f}" * 3 + " {:>9}\n"
+
+    report = "{:>{width}s} ".format("", width=width)
+    report += "".join(
+        " {:>9}".format(header)
+        for header in ["precision", "recall", "f1-score", "support"]
+    )
+    report += "\n\n"
+    for label, score in zip(LABELS, scores):
+        report += row_fmt.format(label, *score, width=width, digits=digits)
+    report += "\n"
+    report += "{:>{width}s} ".format("accuracy", width=width)
+    report += " {:>9}".format("") * 2
+    report += " {:>9.{digits}f} {:>9}\n".format(accuracy, total, digits=digits)
+    for name, average in averages.items():
+        report += row_fmt.format(name, *average, total, width=width, digits=digits)
+    return report
+
+
 def main():
     args = parse_arguments()
 
@@ -146,6 +708,7 @@ def main():
 
     # Determine webhook URL
     webhook_url = args.url if args.url else WEBHOOK_URLS[args.provider]
+    configure_session(args.concurrency)
 
     print(f"{'=' * 60}")
     print(f"FAKE NEWS DETECTION BENCHMARK")
@@ -153,68 +716,141 @@ def main():
     print(f"Provider:    {args.provider.upper()}")
     print(f"Webhook URL: {webhook_url}")
     print(f"Samples:     {args.samples}")
+    print(f"Concurrency: {args.concurrency}")
+    print(f"Batch Size:  {args.batch_size}")
+    print(f"HTTP/2:      {'yes' if args.http2 else 'no'}")
+    print(f"Adaptive:    {'yes' if args.adaptive else 'no'}")
+    if args.max_chars is not None:
+        print(f"Max Chars:   {args.max_chars}")
+    print(f"Gzip:        {'yes' if args.gzip else 'no'}")
+    if args.cache:
+        print(f"Cache:       {args.cache}")
     print(f"Fake CSV:    {args.fake_csv}")
     print(f"True CSV:    {args.true_csv}")
     if args.seed:
         print(f"Random Seed: {args.seed}")
     print(f"{'=' * 60}\n")
 
-    # Load both CSV files with labels
+    # Take random samples from both CSV files with labels
     try:
-        fake_data = load_csv(args.fake_csv, "fake")
-        true_data = load_csv(args.true_csv, "true")
+        samples = sample_csvs(args.fake_csv, args.true_csv, args.samples)
     except FileNotFoundError as e:
         print(f"Error: {e}")
         return
-
-    # Combine both datasets
-    combined_data = fake_data + true_data
-
-    # Take random samples
-    sample_size = min(args.samples, len(combined_data))
-    samples = random.sample(combined_data, sample_size)
+    sample_size = len(samples)
 
     print(f"Sending {sample_size} samples to webhook...\n")
 
     # Tracking metrics
     y_true = []
     y_pred = []
-    latencies = []
+    latencies = LatencyStats(sample_size)
     invalid_responses = 0
     successful_requests = 0
     failed_requests = 0
+    log_lines = []
 
+    # Answer samples from the prediction cache, only send the rest
+    cache = open_cache(args.cache) if args.cache else None
+    cache_keys = {}
+    cache_hits = 0
+    pending = []
     for i, sample in enumerate(samples, 1):
-        title = sample.get("title", "")
-        text = sample.get("text", "")
-        actual_label = sample["_source"]
+        if cache is not None:
+            title, text, actual_label = sample
+            key = cache_key(args.provider, webhook_url, title, text[: args.max_chars])
+            row = cache.execute("SELECT pred FROM kv WHERE hash = ?", (key,)).fetchone()
+            if row is not None:
+                cache_hits += 1
+                prediction = row[0]
+                y_true.append(actual_label)
+                y_pred.append(prediction)
+                status = "✓" if prediction == actual_label else "✗"
+                log_lines.append(
+                    f"[{i}/{sample_size}] {status} Actual: {actual_label}, Predicted: {prediction}, Cached"
+                )
+                continue
+            cache_keys[i] = key
+        pending.append((i, sample))
+    new_predictions = []
+
+    batches = list(chunked(pending, args.batch_size))
+
+    start_time = time.perf_counter_ns()
+    if args.http2 or args.adaptive:
+        completed = stream_batches_http2(
+            webhook_url,
+            batches,
+            args.concurrency,
+            adaptive=args.adaptive,
+            max_chars=args.max_chars,
+            compress=args.gzip,
+        )
+    else:
+        completed = send_batches(
+            webhook_url,
+            batches,
+            args.concurrency,
+            max_chars=args.max_chars,
+            compress=args.gzip,
+        )
+
+    # Bind per-sample lookups to locals for the result loop
+    parse = parse_predictions
+    add_latency = latencies.add
+    append_true = y_true.append
+    append_pred = y_pred.append
+    append_line = log_lines.append
+
+    for batch, result in completed:
+        log_lines.extend(result.get("messages", ()))
+        success = result["success"]
+        count = len(batch)
+        # Spread the request latency evenly over the samples it carried
+        latency = result["latency_ms"] / count
+
+        if success:
+            successful_requests += 1
+            response = result["response"]
+            predictions = parse(response, count)
+        else:
+            failed_requests += 1
+            error = result.get("error", "Unknown error")
+            predictions = [None] * count
 
-        result = send_to_webhook(webhook_url, title, text)
-        latencies.append(result["latency_ms"])
+        for (i, (_, _, actual_label)), prediction in zip(batch, predictions):
+            add_latency(latency)
 
-        if result["success"]:
-            successful_requests += 1
-            prediction = parse_prediction(result["response"])
+            if not success:
+                invalid_responses += 1
+                append_line(f"[{i}/{sample_size}] Request failed: {error}")
+                continue
 
             if prediction is None:
                 invalid_responses += 1
-                print(
-                    f"[{i}/{sample_size}] Invalid response format: {result['response']}"
-                )
+                append_line(f"[{i}/{sample_size}] Invalid response format: {response}")
             else:
-                y_true.append(actual_label)
-                y_pred.append(prediction)
+                append_true(actual_label)
+                append_pred(prediction)
+                if cache is not None:
+                    new_predictions.append((cache_keys[i], prediction))
                 is_correct = prediction == actual_label
                 status = "✓" if is_correct else "✗"
-                print(
-                    f"[{i}/{sample_size}] {status} Actual: {actual_label}, Predicted: {prediction}, Latency: {result['latency_ms']:.2f}ms"
+                append_line(
+                    f"[{i}/{sample_size}] {status} Actual: {actual_label}, Predicted: {prediction}, Latency: {latency:.2f}ms"
                 )
-        else:
-            failed_requests += 1
-            invalid_responses += 1
-            print(
-                f"[{i}/{sample_size}] Request failed: {result.get('error', 'Unknown error')}"
+
+        if len(log_lines) >= LOG_FLUSH_LINES:
+            flush_lines(log_lines)
+    flush_lines(log_lines)
+    wall_time = (time.perf_counter_ns() - start_time) / 1e6
+
+    if cache is not None:
+        with cache:
+            cache.executemany(
+                "INSERT OR REPLACE INTO kv (hash, pred) VALUES (?, ?)", new_predictions
             )
+        cache.close()
 
     # Calculate and display metrics
     print(f"\n{'=' * 60}")
@@ -222,31 +858,43 @@ def main():
     print(f"{'=' * 60}")
 
     # Latency statistics
-    if latencies:
-        avg_latency = sum(latencies) / len(latencies)
-        min_latency = min(latencies)
-        max_latency = max(latencies)
+    if latencies.count:
+        p50, p95, p99 = latencies.percentiles([50, 95, 99])
         print(f"\n📊 LATENCY METRICS:")
-        print(f"   Average Latency: {avg_latency:.2f} ms")
-        print(f"   Min Latency:     {min_latency:.2f} ms")
-        print(f"   Max Latency:     {max_latency:.2f} ms")
-        print(f"   Total Time:      {sum(latencies):.2f} ms")
+        print(f"   Average Latency: {latencies.mean:.2f} ms")
+        print(f"   Min Latency:     {latencies.min:.2f} ms")
+        print(f"   Max Latency:     {latencies.max:.2f} ms")
+        print(f"   P50 Latency:     {p50:.2f} ms")
+        print(f"   P95 Latency:     {p95:.2f} ms")
+        print(f"   P99 Latency:     {p99:.2f} ms")
+        print(f"   Total Time:      {latencies.total:.2f} ms")
+        print(f"   Wall Time:       {wall_time:.2f} ms")
+        if args.concurrency > 1:
+            print(
+                f"   Note: up to {args.concurrency} requests ran in parallel, "
+                "latency includes queueing at the server"
+            )
 
     # Request statistics
     print(f"\n📡 REQUEST STATISTICS:")
-    print(f"   Total Requests:      {sample_size}")
+    print(f"   Total Requests:      {len(batches)}")
     print(f"   Successful:          {successful_requests}")
     print(f"   Failed:              {failed_requests}")
-    print(f"   Invalid Responses:   {invalid_responses}")
+    print(f"   Samples Sent:        {sample_size - cache_hits}")
+    if cache is not None:
+        print(f"   Cache Hits:          {cache_hits}")
+    print(f"   Invalid Samples:     {invalid_responses}")
 
     # Classification metrics
     if y_true and y_pred:
-        correct = sum(1 for t, p in zip(y_true, y_pred) if t == p)
+        cm = confusion_counts(y_true, y_pred)
+        scores = class_scores(cm)
+        correct = int(np.trace(cm))
         accuracy = correct / len(y_true) * 100
 
-        f1 = f1_score(y_true, y_pred, pos_label="fake", average="binary")
-        f1_weighted = f1_score(y_true, y_pred, average="weighted")
-        f1_macro = f1_score(y_true, y_pred, average="macro")
+        f1 = scores[0][2]
+        f1_weighted = sum(score[2] * score[3] for score in scores) / len(y_true)
+        f1_macro = sum(score[2] for score in scores) / len(scores)
 
         print(f"\n🎯 CLASSIFICATION METRICS:")
         print(f"   Accuracy:            {accuracy:.2f}%")
@@ -255,9 +903,8 @@ def main():
         print(f"   F1 Score (macro):    {f1_macro:.4f}")
 
         print(f"\n📋 DETAILED CLASSIFICATION REPORT:")
-        print(classification_report(y_true, y_pred, target_names=["fake", "true"]))
+        print(format_classification_report(scores, correct / len(y_true)))
 
-        cm = confusion_matrix(y_true, y_pred, labels=["fake", "true"])
         print(f"📉 CONFUSION MATRIX:")
         print(f"                 Predicted")
         print(f"                 fake    true")
@@ -1,20 +1,73 @@
 import csv
+import dataclasses
+import math
+import numpy as np
+import orjson
 import random
 import requests
+import sys
 import time
-from sklearn.metrics import f1_score, classification_report, confusion_matrix
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 WEBHOOK_URL = "http://localhost:5678/webhook/d15a6547-dd1d-4031-b6fa-fe92165249eb"
+CONCURRENCY = 1  # Number of webhook requests sent in parallel, 1 keeps latency comparable to sequential runs
+LOG_FLUSH_LINES = 32  # Number of buffered progress lines written to stdout at once
+REQUEST_TIMEOUT = (3.05, 60)  # (connect, read) timeout in seconds
 
-def load_csv(filepath, label):
-    """Load CSV file and return list of dictionaries with source label."""
-    data = []
-    with open(filepath, 'r', encoding='utf-8') as file:
-        reader = csv.DictReader(file)
+# Class labels in confusion matrix order
+LABELS = ['fake', 'true']
+
+# Response fields checked for a prediction, in priority order
+PREDICTION_FIELDS = ('prediction', 'label', 'result', 'classification', 'output')
+
+# Raw response values (lowercased) mapped to their class label
+LABEL_MAP = {'fake': 'fake', 'false': 'fake', '0': 'fake', 'true': 'true', 'real': 'true', '1': 'true'}
+
+# Shared session so TCP connections are reused across requests
+SESSION = requests.Session()
+SESSION.headers.update({'Connection': 'keep-alive', 'Content-Type': 'application/json'})
+_adapter = HTTPAdapter(
+    pool_connections=CONCURRENCY,
+    pool_maxsize=CONCURRENCY,
+    # Never retry a POST after a read timeout, n8n may still be processing it
+    max_retries=Retry(total=2, connect=2, read=False, status=2, backoff_factor=0.1,
+                      status_forcelist=[502, 503], allowed_methods=frozenset(['POST']))
+)
+SESSION.mount('http://', _adapter)
+SESSION.mount('https://', _adapter)
+
+def iter_csv(filepath, label):
+    """Yield the rows of a CSV file one at a time as (title, text, label) tuples."""
+    with open(filepath, 'r', encoding='utf-8', newline='') as file:
+        reader = csv.reader(file)
+        header = next(reader)
+        title_index, text_index = header.index('title'), header.index('text')
         for row in reader:
-            row['_source'] = label  # 'fake' or 'true'
-            data.append(row)
-    return data
+            if row:  # Skip blank lines like csv.DictReader does
+                yield (row[title_index], row[text_index], label)  # label is 'fake' or 'true'
+
+def reservoir_sample(stream, k):
+    """Draw k random items from a stream of unknown length in a single pass."""
+    reservoir = []
+    for index, item in enumerate(stream):
+        if index < k:
+            reservoir.append(item)
+        else:
+            # Keep the new item with probability k / (index + 1)
+            slot = random.randrange(index + 1)
+            if slot < k:
+                reservoir[slot] = item
+    return reservoir
+
+def sample_csvs(fake_path, true_path, sample_size):
+    """Draw random rows from both CSV files in one streaming pass."""
+    samples = reservoir_sample(chain(iter_csv(fake_path, 'fake'), iter_csv(true_path, 'true')), sample_size)
+    # The reservoir keeps stream order for rows that were never replaced
+    random.shuffle(samples)
+    return samples
 
 def send_to_webhook(title, text):
     """Send title and text to the webhook and measure latency."""
@@ -23,36 +76,66 @@ def send_to_webhook(title, text):
         "text": text
     }
 
-    start_time = time.time()
+    start_time = time.perf_counter_ns()
+    response = None
     try:
-        response = requests.post(WEBHOOK_URL, json=payload)
-        end_time = time.time()
-        latency = (end_time - start_time) * 1000  # Convert to milliseconds
-
+        response = SESSION.post(WEBHOOK_URL, data=orjson.dumps(payload), timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
-        return {
+        result = {
             "success": True,
-            "response": response.json(),
-            "latency_ms": latency
+            "response": orjson.loads(response.content)
         }
-    except requests.exceptions.JSONDecodeError:
-        end_time = time.time()
-        latency = (end_time - start_time) * 1000
-        return {
+    except orjson.JSONDecodeError:
+        result = {
             "success": False,
             "error": "Invalid JSON response",
-            "latency_ms": latency,
-            "raw_response": response.text if 'response' in dir() else None
+            "raw_response": response.text if response is not None else None
         }
     except requests.exceptions.RequestException as e:
-        end_time = time.time()
-        latency = (end_time - start_time) * 1000
-        return {
+        result = {
             "success": False,
-            "error": str(e),
-            "latency_ms": latency
+            "error": str(e)
         }
 
+    result["latency_ms"] = (time.perf_counter_ns() - start_time) / 1e6  # Convert to milliseconds
+    return result
+
+@dataclasses.dataclass
+class LatencyStats:
+    """Running latency statistics, with values kept in a float32 array for percentiles."""
+    capacity: int
+    count: int = 0
+    total: float = 0.0
+    min: float = math.inf
+    max: float = -math.inf
+    values: np.ndarray = dataclasses.field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.values = np.empty(self.capacity, dtype=np.float32)
+
+    def add(self, latency):
+        """Record one latency in milliseconds."""
+        self.values[self.count] = latency
+        self.count += 1
+        self.total += latency
+        self.min = min(self.min, latency)
+        self.max = max(self.max, latency)
+
+    @property
+    def mean(self):
+        return self.total / self.count
+
+    def percentiles(self, q):
+        """Return the given percentiles of all recorded latencies."""
+        return np.percentile(self.values[:self.count], q)
+
+def flush_lines(lines):
+    """Write buffered output lines to stdout in a single call and clear them."""
+    if lines:
+        sys.stdout.write("\n".join(lines) + "\n")
+        sys.stdout.flush()
+        lines.clear()
+
 def parse_prediction(response_data):
     """
     Parse the webhook response to extract prediction.
@@ -64,63 +147,107 @@ def parse_prediction(response_data):
         return None
 
     # Try common response field names
-    for field in ['prediction', 'label', 'result', 'classification', 'output']:
-        if field in response_data:
-            value = str(response_data[field]).lower().strip()
-            if value in ['fake', 'false', '0']:
-                return 'fake'
-            elif value in ['true', 'real', '1']:
-                return 'true'
+    for field in PREDICTION_FIELDS:
+        value = response_data.get(field)
+        if value is not None:
+            prediction = LABEL_MAP.get(str(value).lower().strip())
+            if prediction is not None:
+                return prediction
 
     return None
 
-def main():
-    # Load both CSV files with labels
-    fake_data = load_csv('fake.csv', 'fake')
-    true_data = load_csv('true.csv', 'true')
+def confusion_counts(y_true, y_pred):
+    """Count the 2x2 confusion matrix (rows: actual, columns: predicted) in one vectorized pass."""
+    actual = np.fromiter((label == 'true' for label in y_true), dtype=np.uint8, count=len(y_true))
+    predicted = np.fromiter((label == 'true' for label in y_pred), dtype=np.uint8, count=len(y_pred))
+    return np.bincount(actual * 2 + predicted, minlength=4).reshape(2, 2)
 
-    # Combine both datasets
-    combined_data = fake_data + true_data
+def class_scores(cm):
+    """Derive (precision, recall, f1, support) per class from a confusion matrix."""
+    tp = np.diag(cm)
+    predicted = cm.sum(axis=0)
+    support = cm.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(predicted, tp / predicted, 0.0)
+        recall = np.where(support, tp / support, 0.0)
+        f1 = np.where(predicted + support, 2 * tp / (predicted + support), 0.0)
+    return list(zip(precision.tolist(), recall.tolist(), f1.tolist(), support.tolist()))
+
+def format_classification_report(scores, accuracy, digits=2):
+    """Format per-class scores like sklearn's classification_report."""
+    total = sum(support for *_, support in scores)
+    averages = {
+        'macro avg': [sum(score[j] for score in scores) / len(scores) for j in range(3)],
+        'weighted avg': [sum(score[j] * score[3] for score in scores) / total for j in range(3)]
+    }
 
-    # Take 100 random samples (or all if less than 100)
-    sample_size = min(50, len(combined_data))
-    samples = random.sample(combined_data, sample_size)
+    width = max(len(name) for name in LABELS + list(averages))
+    row_fmt = "{:>{width}s} " + " {:>9.{digits}f}" * 3 + " {:>9}\n"
+
+    report = "{:>{width}s} ".format("", width=width)
+    report += "".join(" {:>9}".format(header) for header in ['precision', 'recall', 'f1-score', 'support'])
+    report += "\n\n"
+    for label, score in zip(LABELS, scores):
+        report += row_fmt.format(label, *score, width=width, digits=digits)
+    report += "\n"
+    report += "{:>{width}s} ".format("accuracy", width=width)
+    report += " {:>9}".format("") * 2
+    report += " {:>9.{digits}f} {:>9}\n".format(accuracy, total, digits=digits)
+    for name, average in averages.items():
+        report += row_fmt.format(name, *average, total, width=width, digits=digits)
+    return report
+
+def main():
+    # Take 50 random samples from both CSV files with labels
+    samples = sample_csvs('fake.csv', 'true.csv', 50)
+    sample_size = len(samples)
 
     print(f"Sending {sample_size} samples to webhook...\n")
 
     # Tracking metrics
     y_true = []  # Actual labels
     y_pred = []  # Predicted labels
-    latencies = []
+    latencies = LatencyStats(sample_size)
     invalid_responses = 0
     successful_requests = 0
     failed_requests = 0
+    log_lines = []
 
-    for i, sample in enumerate(samples, 1):
-        title = sample.get('title', '')
-        text = sample.get('text', '')
-        actual_label = sample['_source']
+    start_time = time.perf_counter_ns()
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
+        futures = {
+            executor.submit(send_to_webhook, title, text): (i, actual_label)
+            for i, (title, text, actual_label) in enumerate(samples, 1)
+        }
 
-        result = send_to_webhook(title, text)
-        latencies.append(result['latency_ms'])
+        for future in as_completed(futures):
+            i, actual_label = futures[future]
 
-        if result['success']:
-            successful_requests += 1
-            prediction = parse_prediction(result['response'])
+            result = future.result()
+            latencies.add(result['latency_ms'])
 
-            if prediction is None:
-                invalid_responses += 1
-                print(f"[{i}/{sample_size}] Invalid response format: {result['response']}")
+            if result['success']:
+                successful_requests += 1
+                prediction = parse_prediction(result['response'])
+
+                if prediction is None:
+                    invalid_responses += 1
+                    log_lines.append(f"[{i}/{sample_size}] Invalid response format: {result['response']}")
+                else:
+                    y_true.append(actual_label)
+                    y_pred.append(prediction)
+                    is_correct = prediction == actual_label
+                    status = "✓" if is_correct else "✗"
+                    log_lines.append(f"[{i}/{sample_size}] {status} Actual: {actual_label}, Predicted: {prediction}, Latency: {result['latency_ms']:.2f}ms")
             else:
-                y_true.append(actual_label)
-                y_pred.append(prediction)
-                is_correct = prediction == actual_label
-                status = "✓" if is_correct else "✗"
-                print(f"[{i}/{sample_size}] {status} Actual: {actual_label}, Predicted: {prediction}, Latency: {result['latency_ms']:.2f}ms")
-        else:
-            failed_requests += 1
-            invalid_responses += 1
-            print(f"[{i}/{sample_size}] Request failed: {result.get('error', 'Unknown error')}")
+                failed_requests += 1
+                invalid_responses += 1
+                log_lines.append(f"[{i}/{sample_size}] Request failed: {result.get('error', 'Unknown error')}")
+
+            if len(log_lines) >= LOG_FLUSH_LINES:
+                flush_lines(log_lines)
+    flush_lines(log_lines)
+    wall_time = (time.perf_counter_ns() - start_time) / 1e6
 
     # Calculate and display metrics
     print("\n" + "="*60)
@@ -128,15 +255,19 @@ def main():
     print("="*60)
 
     # Latency statistics
-    if latencies:
-        avg_latency = sum(latencies) / len(latencies)
-        min_latency = min(latencies)
-        max_latency = max(latencies)
+    if latencies.count:
+        p50, p95, p99 = latencies.percentiles([50, 95, 99])
         print(f"\n📊 LATENCY METRICS:")
-        print(f"   Average Latency: {avg_latency:.2f} ms")
-        print(f"   Min Latency:     {min_latency:.2f} ms")
-        print(f"   Max Latency:     {max_latency:.2f} ms")
-        print(f"   Total Time:      {sum(latencies):.2f} ms")
+        print(f"   Average Latency: {latencies.mean:.2f} ms")
+        print(f"   Min Latency:     {latencies.min:.2f} ms")
+        print(f"   Max Latency:     {latencies.max:.2f} ms")
+        print(f"   P50 Latency:     {p50:.2f} ms")
+        print(f"   P95 Latency:     {p95:.2f} ms")
+        print(f"   P99 Latency:     {p99:.2f} ms")
+        print(f"   Total Time:      {latencies.total:.2f} ms")
+        print(f"   Wall Time:       {wall_time:.2f} ms")
+        if CONCURRENCY > 1:
+            print(f"   Note: {CONCURRENCY} requests ran in parallel, latency includes queueing at the server")
 
     # Request statistics
     print(f"\n📡 REQUEST STATISTICS:")
@@ -147,14 +278,18 @@ def main():
 
     # Classification metrics (only if we have valid predictions)
     if y_true and y_pred:
+        # Confusion matrix, all other metrics are derived from it
+        cm = confusion_counts(y_true, y_pred)
+        scores = class_scores(cm)
+
         # Calculate accuracy
-        correct = sum(1 for t, p in zip(y_true, y_pred) if t == p)
+        correct = int(np.trace(cm))
         accuracy = correct / len(y_true) * 100
 
         # Calculate F1 score
-        f1 = f1_score(y_true, y_pred, pos_label='fake', average='binary')
-        f1_weighted = f1_score(y_true, y_pred, average='weighted')
-        f1_macro = f1_score(y_true, y_pred, average='macro')
+        f1 = scores[0][2]
+        f1_weighted = sum(score[2] * score[3] for score in scores) / len(y_true)
+        f1_macro = sum(score[2] for score in scores) / len(scores)
 
         print(f"\n🎯 CLASSIFICATION METRICS:")
         print(f"   Accuracy:            {accuracy:.2f}%")
@@ -164,10 +299,8 @@ def main():
 
         # Detailed classification report
         print(f"\n📋 DETAILED CLASSIFICATION REPORT:")
-        print(classification_report(y_true, y_pred, target_names=['fake', 'true']))
+        print(format_classification_report(scores, correct / len(y_true)))
 
-        # Confusion matrix
-        cm = confusion_matrix(y_true, y_pred, labels=['fake', 'true'])
         print(f"📉 CONFUSION MATRIX:")
         print(f"                 Predicted")
         print(f"                 fake    true")